@@ -5,16 +5,59 @@ import urllib.request
 from typing import Optional
 
 import re
-import pandas as pd
 import streamlit as st
 from pyxform.xls2xform import xls2xform_convert
 from pyxform.errors import PyXFormError
 
+from validation import Finding, validate_xlsform
+
 
 st.title("XLSForm Validator")
 st.write("Step 1: provide your XLSForm as an Excel file (.xls or .xlsx), or as a Google Sheet.")
 
 
+# Read the export in chunks so an oversized or non-XLSX response is rejected early.
+# The cap matches Streamlit's default upload limit (server.maxUploadSize = 200 MB).
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAX_DOWNLOAD_BYTES = 200 * 1024 * 1024
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_google_sheet_xlsx(sheet_id: str) -> bytes:
+    """
+    Fetches the XLSX export of a Google Sheet.
+
+    Cached per sheet id for 5 minutes so reruns don't download the same sheet again.
+    Failures raise instead of returning, so they are never cached.
+    """
+    export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=xlsx"
+
+    req = urllib.request.Request(
+        export_url,
+        headers={
+            # Some environments get blocked without a UA; keep it simple.
+            "User-Agent": "Mozilla/5.0",
+        },
+        method="GET",
+    )
+
+    data = bytearray()
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        while chunk := resp.read(DOWNLOAD_CHUNK_SIZE):
+            data += chunk
+
+            # Basic sanity check: XLSX is a zip file ("PK"). Stop before fetching the rest.
+            if len(data) >= 4 and not data.startswith(b"PK"):
+                raise ValueError("Downloaded file is not an XLSX")
+            if len(data) > MAX_DOWNLOAD_BYTES:
+                raise ValueError("Downloaded file is too large")
+
+    if len(data) < 4:
+        raise ValueError("Downloaded file is not an XLSX")
+
+    return bytes(data)
+
+
 def download_google_sheet_as_xlsx(url: str) -> tuple[Optional[bytes], Optional[str]]:
     """
     Downloads a public Google Sheet as XLSX bytes.
@@ -32,35 +75,64 @@ def download_google_sheet_as_xlsx(url: str) -> tuple[Optional[bytes], Optional[s
     if not m:
         return None, "Invalid Google Sheets URL"
 
-    sheet_id = m.group(1)
-    export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=xlsx"
-
-    req = urllib.request.Request(
-        export_url,
-        headers={
-            # Some environments get blocked without a UA; keep it simple.
-            "User-Agent": "Mozilla/5.0",
-        },
-        method="GET",
-    )
-
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = resp.read()
+        data = fetch_google_sheet_xlsx(m.group(1))
     except urllib.error.HTTPError as exc:
         # Private sheet commonly yields 401/403; bad id yields 404.
         return None, f"HTTP {exc.code}"
     except urllib.error.URLError:
         return None, "Network error"
+    except ValueError as exc:
+        return None, str(exc)
     except Exception:
         return None, "Unexpected error"
 
-    # Basic sanity check: XLSX is a zip file ("PK").
-    if not data or len(data) < 4 or not data.startswith(b"PK"):
-        return None, "Downloaded file is not an XLSX"
-
     return data, None
 
+
+# Rows rendered per result table; longer tables are offered in full as a CSV download instead
+MAX_DISPLAY_ROWS = 200
+
+
+def render_findings(findings: list[Finding]) -> None:
+    """
+    Shows each finding in order. An error is always the last finding of its run, so the
+    script stops after rendering it, exactly like the inline checks used to.
+    """
+    for finding in findings:
+        if finding.level == "error":
+            st.error(finding.message)
+        else:
+            st.warning(finding.message)
+
+        if finding.caption:
+            st.caption(finding.caption)
+
+        if finding.table is not None:
+            st.dataframe(
+                finding.table.head(MAX_DISPLAY_ROWS),
+                use_container_width = True
+            )
+
+            if len(finding.table) > MAX_DISPLAY_ROWS:
+                st.caption(f"Showing the first {MAX_DISPLAY_ROWS} of {len(finding.table):,} rows.")
+
+                csv_name = re.sub(r"[^a-z0-9]+", "_", finding.message.lower()).strip("_") + ".csv"
+                st.download_button(
+                    "Download full list (CSV)",
+                    finding.table.to_csv(index=False).encode(),
+                    file_name=csv_name,
+                    mime="text/csv",
+                    key=csv_name,
+                )
+
+        if finding.level == "error":
+            st.stop()
+
+
+# Leading bytes of .xlsx (zip, "PK") and legacy .xls (OLE2) files
+EXCEL_SIGNATURES = (b"PK", b"\xd0\xcf\x11\xe0")
+
 input_method = st.radio(
     "Choose input method",
     options=["Upload Excel file", "Google Sheets URL"],
@@ -87,6 +159,11 @@ file_label: str = ""
 if input_method == "Upload Excel file" and uploaded_file:
     file_bytes = uploaded_file.getvalue()
     file_label = uploaded_file.name
+
+    # Constant-time reject of renamed/garbage files, before pandas tries to unpack them
+    if not file_bytes.startswith(EXCEL_SIGNATURES):
+        st.error(f"Not a valid Excel file: {file_label} is not an .xls or .xlsx workbook.")
+        st.stop()
 elif input_method == "Google Sheets URL" and sheet_url.strip():
     data, err = download_google_sheet_as_xlsx(sheet_url)
     if err:
@@ -112,396 +189,21 @@ if not file_bytes:
 
 st.success(f"Loaded input: {file_label} ({len(file_bytes):,} bytes)")
 
-try:
-    survey_df = pd.read_excel(
-        io.BytesIO(file_bytes),
-        sheet_name="survey"
-    )
-except Exception as exc:
-    st.error(f"Unable to read the 'survey' sheet from this file: {exc}")
-    st.stop()
-
-if "name" not in survey_df.columns:
-    st.error("The 'survey' sheet must contain a 'name' column.")
-    st.stop()
-
-st.success(
-    "Valid XLSForm structure."
-)
+report = validate_xlsform(file_bytes)
 
 #----- Basic Validation: -----
 st.subheader("Basic XLSForm Validation")
- 
-try:
-    xls = pd.ExcelFile(io.BytesIO(file_bytes))
-except Exception as exc:
-    st.error(f"Not a valid Excel file: {exc}")
-    st.stop()
-
-# Check for required sheets
-required_sheets = {"survey"}
 
-missing_sheets = required_sheets - set(xls.sheet_names)
+render_findings(report.basic)
 
-if missing_sheets:
-    st.error(f"Missing required sheets: {', '.join(missing_sheets)}")
-    st.stop()
-
-# Check for required columns
-required_columns = {"type", "name"}
-
-missing_columns = required_columns - set(survey_df.columns)
-if missing_columns:
-    st.error(f"'survey' sheet is missing required columns: {', '.join(missing_columns)}")
-    st.stop()
-
-# Check for duplicate question names and output the row number if issue exist  ⚠️⚠️⚠️ Covered by Pyxform
-dup_mask = (
-    survey_df["name"].notna() &
-    survey_df["name"].duplicated(keep=False)
-)
-
-if dup_mask.any():
-    st.error("Duplicate question names found.")
-    st.caption("Each question name must be unique in an XLSForm.")
-
-    dup_df = survey_df.loc[dup_mask, ["name"]].copy()
-    dup_df["excel_row"] = dup_df.index + 2
-    dup_df = dup_df.sort_values(["name", "excel_row"])
-
-    st.dataframe(
-        dup_df[["excel_row", "name"]],
-        use_container_width = True
-    )
-    st.stop()
-
-
-# Check for invalid question names and output the row number if issue exists
-invalid_name_mask = survey_df["name"].dropna().apply(
-    lambda x: not re.match(r"^[A-Za-z][A-Za-z0-9_]*$", str(x))
+st.success(
+    "Valid XLSForm structure."
 )
-
-if invalid_name_mask.any():
-    st.error(
-        "Invalid question name found." 
-        "Names must start with a letter and contain only letters, numbers, and underscores"
-    )
-
-    invalid_df = survey_df.loc[invalid_name_mask, ["name"]].copy()
-    invalid_df["excel_row"] = invalid_df.index + 2
-
-    st.dataframe(
-        invalid_df[["excel_row", "name"]],
-        user_container_width= True
-    )
-    st.stop()
-
-# Check for select_one & select_multiple consistency
-select_used = survey_df["type"].str.contains(
-    r"select_(one|multiple)\b", regex = True, na = False
-).any()
-
-if select_used and "choices" not in xls.sheet_names:
-    st.error("This form uses select_one / select_multiple but has no 'choices' sheet.")
-    st.stop()
-
-if "choices" in xls.sheet_names:
-    choices_df = pd.read_excel(xls, sheet_name="choices")
-
-    if not {"list_name", "value"}.issubset(choices_df.columns):
-        st.error("'choices' sheet must contain 'list_name' and 'value' columns.")
-        st.stop()
-
-    defined_lists = set(choices_df["list_name"].dropna())
-
-    used_lists_df = (
-        survey_df["type"]
-        .dropna()
-        .str.extract(r"select_(?:one|multiple)\s+([^\s]+)")
-        .rename(columns={0: "list_name"})
-    )
-
-    used_lists_df["excel_row"] = used_lists_df.index + 2
-    used_lists_df = used_lists_df.dropna(subset=["list_name"])
-
-    missing_lists_mask = ~used_lists_df["list_name"].isin(defined_lists)
-
-    if missing_lists_mask.any():
-        st.error("Missing choice lists referenced in survey.")
-        st.caption("These select_one / select_multiple questions reference lists not defined in the choices sheet.")
-
-        st.dataframe(
-            used_lists_df.loc[missing_lists_mask, ["excel_row", "list_name"]],
-            use_container_width=True
-        )
-        st.stop()
-
-# Check for duplicate choices inside a list TODO: [Optional] Show row numbere where issue persists
-if "choices" in xls.sheet_names:
-    dup_mask = choices_df.duplicated(subset=["list_name", "value"], keep=False)
-    dup_mask = dup_mask & choices_df["list_name"].notna() & choices_df["value"].notna()
-
-    if dup_mask.any():
-        st.error("Duplicate choice names found within the same list:")
-        st.dataframe(choices_df.loc[dup_mask, ["list_name", "value"]])
-        st.stop()
-
-
-# Check for (Unused) Choice Lists and Warn if found (Does not stop the application)
-if "choices" in xls.sheet_names and not used_lists_df.empty:
-    defined_lists = set(choices_df["list_name"].dropna())
-
-    used_lists = set(used_lists_df["list_name"].dropna())
-
-    unused_lists = sorted(defined_lists - used_lists)
-
-    if unused_lists:
-        st.warning("Unused choice lists detected:")
-        st.caption(
-            "These lists are defined in the 'choices' sheet but are not used "
-            "by any select_one / select_multiple questions in the survey sheet. "
-            "This wil NOT break the form, but may indicate leftover or unused data."
-        )
-
-        unused_df = (
-            choices_df[choices_df["list_name"].isin(unused_lists)]
-            .loc[:, ["list_name"]]
-            .copy()
-        )
-
-        unused_df["excel_row"] = unused_df.index + 2
-        unused_df = unused_df.drop_duplicates().sort_values("list_name")
-
-        st.dataframe(
-            unused_df[["excel_row", "list_name"]],
-            use_container_width = True
-        )
-
-# Check for empty type or name cells
-missing_type = survey_df["type"].isna()
-
-if missing_type.any():
-    st.error("Empty cells found in required column 'type'.")
-
-    missing_type_df = survey_df.loc[missing_type, ["name"]].copy()
-    missing_type_df["excel_row"] = missing_type_df.index + 2
-
-    st.dataframe(
-        missing_type_df[["excel_row", "name"]],
-        user_container_width = True
-    )
-    st.stop()
-
-# end_group / end_repeat rows may have empty name per XLSForm spec
-end_types = {"end group", "end repeat"}
-type_normalized = survey_df["type"].fillna("").astype(str).str.strip().str.lower()
-# Keep normalized variants for downstream checks
-survey_df["type_norm"] = type_normalized
-survey_df["name_norm"] = survey_df["name"].fillna("").astype(str).str.strip().str.lower()
-rows_requiring_name = ~type_normalized.isin(end_types)
-
-missing_name = survey_df["name"].isna() & rows_requiring_name
-if missing_name.any():
-    st.error("Empty cells found in required column 'name' (except 'end group' / 'end repeat' rows).")
-    
-    missing_name_df = survey_df.loc[missing_name, ["type"]].copy()
-    missing_name_df["excel_row"] = missing_name_df.index + 2
-
-    st.dataframe(
-        missing_name_df[["excel_row", "type"]],
-        use_container_width = True
-    )
-    st.stop()
-
-
 st.success("Basic XLSForm checks successful")
 
 
 #---------------------- Standardization Checks in Accordance with ATR Specifications: ----------------------#
-# ---------Name Length Check ---------#
-MAX_NAME_LENGTH = 100
-
-name_length_mask = (
-    survey_df["name"]
-    .dropna()
-    .astype(str)
-    .str.len() > MAX_NAME_LENGTH
-)
-
-if name_length_mask.any():
-    st.warning(f"Question names exceeding {MAX_NAME_LENGTH} characters detected.")
-    st.caption(
-        "Shorter names (< = 100 characters) are recommended for better usability and readability."
-    )
-
-    long_name_df = survey_df.loc[name_length_mask, ["name"]].copy()
-    long_name_df["length"] = long_name_df["name"].astype(str).str.len()
-    long_name_df["excel_row"] = long_name_df.index + 2
-
-    st.dataframe(
-        long_name_df[["excel_row", "name", "length"]],
-        use_container_width = True
-    )
-
-# -------- Meta Columns ---------- #
-REQUIRED_STANDARD_NAMES = {
-    "Starttime",
-    "Endtime",
-    "Deviceid",
-    "Subscriberid",
-    "Simid",
-    "Devicephonenum",
-    "Username",
-    "sensor_statistic mean_movement",
-    "sensor_statistic mean_sound_level",
-    "sensor_statistic mean_sound_pitch",
-    "sensor_statistic pct_conversation",
-    "TA",
-    "AA",
-    "duration",
-    "Date_And_Time",
-    "Geopoint",
-    "Surveyor_Id",
-    "Surveyor_Name",
-    "Surveyor_Gender",
-    "Site_Visit_ID",
-    "Site_Visit_Subcategory_ID",
-    "TPMA_Location_Name",
-    "TPMA_Location_ID",
-    "Province",
-    "District",
-    "Village",
-    "Region",
-    "Area_Type",
-    "Line_Ministry_Name",
-    "Line_Ministry_Project_Id",
-    "Line_Ministry_SubProject_Id",
-    "Line_Ministry_Sub_Project_Name_And_Description",
-    "Type_Of_Site_Visit",
-    "Type_Of_Visit",
-    "If_not_a_first_Site_Visit_state_Original_Site_Visit_ID",
-}
-
-
-# Normalize all survey names to lowercase and strip whitespace
-survey_names_normalized = (
-    survey_df["name"]
-    .dropna()
-    .astype(str)
-    .str.strip()
-    .str.lower()
-)
-# Normalize all required standard names to lowercase and strip whitespace
-required_names_normalized = {n.strip().lower() for n in REQUIRED_STANDARD_NAMES}
-
-# Find Missing Required Standard Names
-missing_standard_names = sorted(required_names_normalized - set(survey_names_normalized))
-
-# Display check results
-if missing_standard_names:
-    st.warning("Missing standard organization fields detected.")
-    st.caption("These question names are expected across all ATR related forms, but were not found in this XLSForm.")
-
-    # Map back to original case for display
-    display_names = sorted([
-        next(orig for orig in REQUIRED_STANDARD_NAMES if orig.lower() == m)
-        for m in missing_standard_names
-    ])
-
-    st.dataframe(
-        pd.DataFrame({"missing_field_name": display_names}), use_container_width = True
-    )
-
-#TODO: Show which ones are present for better user experience
-
-# ---------- Check capitalization of "names" column ---------- #
-lowercase_mask = survey_df["name"].dropna().apply(
-    lambda x: re.match(r"^[a-z][a-z0-9_]*$", str(x)) is not None
-)
-
-# Identify rows that should follow the lowercase rule
-non_standard_mask = ~survey_df["name"].astype(str).str.lower().isin(required_names_normalized)
-
-invalid_lowercase_mask = (~lowercase_mask) & non_standard_mask
-
-# Display the check results with row
-if invalid_lowercase_mask.any():
-    st.warning("Non-standard naming detected (must be lowercase).")
-    st.caption("All question names must be lowercase (snake_case), except for the predefined standard fields.")
-
-    invalid_case_df = survey_df.loc[invalid_lowercase_mask, ["name"]].copy()
-    invalid_case_df["excel_row"] = invalid_case_df.index + 2
-
-    st.dataframe(
-        invalid_case_df[["excel_row", "name"]],
-        use_container_width = True
-    )
-#TODO: [Optional] Show suggested fix for the non-standard name
-
-
-# --------- Check fo Media fields followed immediately by calculate field with name <media_name> + _qa  ---------#
-# Image and Audio 
-MEDIA_QA_RULES = {
-    "image": "_qa",
-    "audio": "_translation",
-}
-
-media_errors = []
-
-for i in range(len(survey_df) - 1):
-
-    current_type = survey_df.loc[i, "type_norm"]
-    current_name = survey_df.loc[i, "name_norm"]
-
-    if current_type in MEDIA_QA_RULES:
-
-        expected_suffix = MEDIA_QA_RULES[current_type]
-        expected_name = f"{current_name}{expected_suffix}"
-
-        # Look forward (skip empty rows)
-        j = i + 1
-        while j < len(survey_df) and survey_df.loc[j, "type_norm"] == "":
-            j += 1
-
-        # No next row
-        if j >= len(survey_df):
-            media_errors.append({
-                "excel_row": i + 2,
-                "type": current_type,
-                "name": current_name,
-                "issue": "Missing calculate row after field"
-            })
-            continue
-
-        next_type = survey_df.loc[j, "type_norm"]
-        next_name = survey_df.loc[j, "name_norm"]
-
-        if not (next_type == "calculate" and next_name == expected_name):
-            media_errors.append({
-                "field_excel_row": i + 2,
-                "field_type": current_type,
-                "field_name": current_name,
-                "expected_calculate_name": expected_name,
-                "found_type": next_type,
-                "found_name": next_name,
-                "found_excel_row": j + 2
-            })
-
-
-# Display results of the Check
-if media_errors:
-    st.warning("Media QA validation failed.")
-
-    st.caption(
-        "Media fields must be followed by a calculate field:\n"
-        "- image → <name>_qa\n"
-        "- audio → <name>_translation"
-    )
-
-    st.dataframe(
-        pd.DataFrame(media_errors),
-        use_container_width = True
-    )
+render_findings(report.standards)
 
 #-------------------- Pyxfrom Validation Integration --------------------#
 st.subheader("XLSForm Specification Validation (pyxform)")
@@ -0,0 +1,472 @@
+"""
+XLSForm checks, kept free of Streamlit UI calls so a whole run can be cached per upload.
+
+validate_xlsform() returns a ValidationReport; app.py renders it.
+"""
+import io
+import re
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+# Compiled once at import; the checks below reuse the bound pattern objects.
+NAME_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+LOWERCASE_NAME_RE = re.compile(r"^[a-z][a-z0-9_]*$")
+SELECT_RE = re.compile(r"select_(?:one|multiple)\b")
+SELECT_LIST_RE = re.compile(r"select_(?:one|multiple)\s+([^\s]+)")
+
+# Columns the checks below actually read (survey: type/name, choices: list_name/value).
+# Everything else (labels, hints, constraints, media, translations) is skipped at parse time.
+USED_COLUMNS = {"type", "name", "list_name", "value"}
+# Sheets the checks below read; any others (settings, entities, ...) are never parsed.
+USED_SHEETS = ("survey", "choices")
+
+MAX_NAME_LENGTH = 100
+
+REQUIRED_STANDARD_NAMES = {
+    "Starttime",
+    "Endtime",
+    "Deviceid",
+    "Subscriberid",
+    "Simid",
+    "Devicephonenum",
+    "Username",
+    "sensor_statistic mean_movement",
+    "sensor_statistic mean_sound_level",
+    "sensor_statistic mean_sound_pitch",
+    "sensor_statistic pct_conversation",
+    "TA",
+    "AA",
+    "duration",
+    "Date_And_Time",
+    "Geopoint",
+    "Surveyor_Id",
+    "Surveyor_Name",
+    "Surveyor_Gender",
+    "Site_Visit_ID",
+    "Site_Visit_Subcategory_ID",
+    "TPMA_Location_Name",
+    "TPMA_Location_ID",
+    "Province",
+    "District",
+    "Village",
+    "Region",
+    "Area_Type",
+    "Line_Ministry_Name",
+    "Line_Ministry_Project_Id",
+    "Line_Ministry_SubProject_Id",
+    "Line_Ministry_Sub_Project_Name_And_Description",
+    "Type_Of_Site_Visit",
+    "Type_Of_Visit",
+    "If_not_a_first_Site_Visit_state_Original_Site_Visit_ID",
+}
+
+# Image and Audio fields must be followed by a calculate field named <media_name> + suffix
+MEDIA_QA_RULES = {
+    "image": "_qa",
+    "audio": "_translation",
+}
+
+
+@dataclass
+class Finding:
+    """A single check result, with an optional table of the offending rows."""
+    level: str  # "error" (ends the run) or "warning"
+    message: str
+    caption: Optional[str] = None
+    table: Optional[pd.DataFrame] = None
+
+
+@dataclass
+class ValidationReport:
+    """
+    Findings from validate_xlsform(), grouped by the stage that produced them.
+
+    Stages run in order and the first error ends the run, so an error is always the
+    last finding of the last non-empty stage.
+    """
+    basic: list[Finding] = field(default_factory=list)
+    standards: list[Finding] = field(default_factory=list)
+
+
+def has_error(findings: list[Finding]) -> bool:
+    """True if any of the findings is an error."""
+    return any(f.level == "error" for f in findings)
+
+
+def load_workbook(file_bytes: bytes) -> tuple[frozenset[str], dict[str, pd.DataFrame]]:
+    """
+    Lists the sheets of an Excel workbook and parses those in USED_SHEETS (USED_COLUMNS only).
+
+    Listing sheets only reads workbook metadata, so a file without a 'survey' sheet is rejected
+    before any cell data is parsed.
+
+    Returns:
+        (sheet_names, sheets): a frozenset of every sheet name, and a dict of the parsed sheets.
+    """
+    # calamine (Rust) reads both .xls and .xlsx and is much faster than openpyxl.
+    with pd.ExcelFile(io.BytesIO(file_bytes), engine="calamine") as xls:
+        # Built once; every "<sheet> in sheet_names" test is then a hash lookup
+        sheet_names = frozenset(xls.sheet_names)
+        if "survey" not in sheet_names:
+            return sheet_names, {}
+
+        to_read = [name for name in USED_SHEETS if name in sheet_names]
+        sheets = pd.read_excel(xls, sheet_name=to_read, usecols=lambda c: c in USED_COLUMNS)
+
+    return sheet_names, sheets
+
+
+def analyze_choices(choices_df: pd.DataFrame) -> tuple[pd.Index, pd.Series]:
+    """
+    Scans the 'choices' sheet once for the lists it defines and for duplicate choices.
+
+    Returns:
+        (defined_lists, dup_mask): an Index of the distinct non-empty list names, and a boolean
+        mask of rows whose (list_name, value) pair appears more than once.
+    """
+    keys = choices_df[["list_name", "value"]]
+
+    # unique() dedupes in pandas' hash table; wrapping the result keeps isin/difference vectorized
+    defined_lists = pd.Index(keys["list_name"].dropna().unique())
+    dup_mask = keys.duplicated(keep=False) & keys.notna().all(axis=1)
+
+    return defined_lists, dup_mask
+
+
+@st.cache_data(show_spinner=False)
+def validate_xlsform(file_bytes: bytes) -> ValidationReport:
+    """
+    Runs the basic and ATR standardization checks on an XLSForm.
+
+    Cached on the file bytes, so Streamlit reruns for the same input skip both the Excel
+    parse and the checks.
+    """
+    report = ValidationReport()
+
+    try:
+        sheet_names, wb = load_workbook(file_bytes)
+    except Exception as exc:
+        report.basic.append(Finding("error", f"Not a valid Excel file: {exc}"))
+        return report
+
+    # Check for required sheets (before touching any sheet data)
+    required_sheets = {"survey"}
+
+    missing_sheets = required_sheets - sheet_names
+
+    if missing_sheets:
+        report.basic.append(Finding("error", f"Missing required sheets: {', '.join(missing_sheets)}"))
+        return report
+
+    # Both sheets come out of the single workbook open in load_workbook()
+    survey_df = wb["survey"]
+    choices_df = wb.get("choices")
+
+    _run_basic_checks(report, survey_df, choices_df, sheet_names)
+    if has_error(report.basic):
+        return report
+
+    _run_standards_checks(report, survey_df)
+
+    return report
+
+
+def _run_basic_checks(
+    report: ValidationReport,
+    survey_df: pd.DataFrame,
+    choices_df: Optional[pd.DataFrame],
+    sheet_names: frozenset[str],
+) -> None:
+    """
+    Basic XLSForm validation; stops at the first error. Adds the normalized columns
+    'type_norm' and 'name_norm' to survey_df for the standardization checks.
+    """
+    findings = report.basic
+
+    # Check for required columns
+    required_columns = {"type", "name"}
+
+    missing_columns = required_columns - set(survey_df.columns)
+    if missing_columns:
+        findings.append(Finding(
+            "error", f"'survey' sheet is missing required columns: {', '.join(missing_columns)}"
+        ))
+        return
+
+    # Arrow-backed strings: contiguous UTF-8 buffers and native .str kernels instead of boxed Python objects
+    survey_df["name"] = survey_df["name"].astype("string[pyarrow]")
+    # 'type' has a small vocabulary (text, integer, select_one x, begin group, ...); as a category the
+    # .str methods below run once per distinct type and are mapped back to the rows through the codes
+    survey_df["type"] = survey_df["type"].astype("string[pyarrow]").astype("category")
+
+    # Normalize the type column once; the checks below all reuse these
+    type_series = survey_df["type"]
+    type_normalized = type_series.str.strip().str.lower()
+
+    # Check for duplicate question names and output the row number if issue exist  ⚠️⚠️⚠️ Covered by Pyxform
+    # One counting pass; value_counts drops empty names, so they never match.
+    name_counts = survey_df["name"].value_counts()
+    dup_mask = survey_df["name"].isin(name_counts.index[name_counts > 1])
+
+    if dup_mask.any():
+        dup_df = survey_df.loc[dup_mask, ["name"]].copy()
+        dup_df["excel_row"] = dup_df.index + 2
+        dup_df = dup_df.sort_values(["name", "excel_row"])
+
+        findings.append(Finding(
+            "error",
+            "Duplicate question names found.",
+            caption="Each question name must be unique in an XLSForm.",
+            table=dup_df[["excel_row", "name"]],
+        ))
+        return
+
+    # Check for invalid question names and output the row number if issue exists
+    # Empty names count as matches here; they are reported by the empty-cell check below
+    invalid_name_mask = ~survey_df["name"].str.match(NAME_RE, na=True)
+
+    if invalid_name_mask.any():
+        invalid_df = survey_df.loc[invalid_name_mask, ["name"]].copy()
+        invalid_df["excel_row"] = invalid_df.index + 2
+
+        findings.append(Finding(
+            "error",
+            "Invalid question name found."
+            "Names must start with a letter and contain only letters, numbers, and underscores",
+            table=invalid_df[["excel_row", "name"]],
+        ))
+        return
+
+    # Check for select_one & select_multiple consistency
+    select_used = type_series.str.contains(SELECT_RE, na = False).any()
+
+    if select_used and "choices" not in sheet_names:
+        findings.append(Finding("error", "This form uses select_one / select_multiple but has no 'choices' sheet."))
+        return
+
+    if "choices" in sheet_names:
+        if not {"list_name", "value"}.issubset(choices_df.columns):
+            findings.append(Finding("error", "'choices' sheet must contain 'list_name' and 'value' columns."))
+            return
+
+        defined_lists, choice_dup_mask = analyze_choices(choices_df)
+
+        used_lists_df = (
+            type_series
+            .str.extract(SELECT_LIST_RE)
+            .rename(columns={0: "list_name"})
+        )
+
+        used_lists_df["excel_row"] = used_lists_df.index + 2
+        used_lists_df = used_lists_df.dropna(subset=["list_name"])
+
+        # Hash lookup over the whole column; the same mask gives both the missing names and their rows
+        missing_lists_mask = ~used_lists_df["list_name"].isin(defined_lists)
+
+        if missing_lists_mask.any():
+            missing_lists = sorted(used_lists_df.loc[missing_lists_mask, "list_name"].unique())
+
+            findings.append(Finding(
+                "error",
+                f"Missing choice lists referenced in survey: {', '.join(missing_lists)}",
+                caption="These select_one / select_multiple questions reference lists not defined in the choices sheet.",
+                table=used_lists_df.loc[missing_lists_mask, ["excel_row", "list_name"]],
+            ))
+            return
+
+        # Check for duplicate choices inside a list TODO: [Optional] Show row numbere where issue persists
+        if choice_dup_mask.any():
+            findings.append(Finding(
+                "error",
+                "Duplicate choice names found within the same list:",
+                table=choices_df.loc[choice_dup_mask, ["list_name", "value"]],
+            ))
+            return
+
+        # Check for (Unused) Choice Lists and Warn if found (Does not stop the checks)
+        if not used_lists_df.empty:
+            unused_lists = sorted(defined_lists.difference(used_lists_df["list_name"].unique()))
+
+            if unused_lists:
+                unused_df = (
+                    choices_df[choices_df["list_name"].isin(unused_lists)]
+                    .loc[:, ["list_name"]]
+                    .copy()
+                )
+
+                unused_df["excel_row"] = unused_df.index + 2
+                unused_df = unused_df.drop_duplicates().sort_values("list_name")
+
+                findings.append(Finding(
+                    "warning",
+                    "Unused choice lists detected:",
+                    caption=(
+                        "These lists are defined in the 'choices' sheet but are not used "
+                        "by any select_one / select_multiple questions in the survey sheet. "
+                        "This wil NOT break the form, but may indicate leftover or unused data."
+                    ),
+                    table=unused_df[["excel_row", "list_name"]],
+                ))
+
+    # Check for empty type or name cells
+    missing_type = type_series.isna()
+
+    if missing_type.any():
+        missing_type_df = survey_df.loc[missing_type, ["name"]].copy()
+        missing_type_df["excel_row"] = missing_type_df.index + 2
+
+        findings.append(Finding(
+            "error",
+            "Empty cells found in required column 'type'.",
+            table=missing_type_df[["excel_row", "name"]],
+        ))
+        return
+
+    # end_group / end_repeat rows may have empty name per XLSForm spec
+    end_types = {"end group", "end repeat"}
+    # Keep normalized variants for downstream checks
+    survey_df["type_norm"] = type_normalized.fillna("")
+    survey_df["name_norm"] = survey_df["name"].fillna("").astype(str).str.strip().str.lower()
+    rows_requiring_name = ~type_normalized.isin(end_types)
+
+    missing_name = survey_df["name"].isna() & rows_requiring_name
+    if missing_name.any():
+        missing_name_df = survey_df.loc[missing_name, ["type"]].copy()
+        missing_name_df["excel_row"] = missing_name_df.index + 2
+
+        findings.append(Finding(
+            "error",
+            "Empty cells found in required column 'name' (except 'end group' / 'end repeat' rows).",
+            table=missing_name_df[["excel_row", "type"]],
+        ))
+        return
+
+
+def _run_standards_checks(report: ValidationReport, survey_df: pd.DataFrame) -> None:
+    """Standardization checks in accordance with ATR specifications; these only warn."""
+    findings = report.standards
+
+    # ---------Name Length Check ---------#
+    name_lengths = survey_df["name"].str.len()
+    name_length_mask = name_lengths.gt(MAX_NAME_LENGTH).fillna(False)
+
+    if name_length_mask.any():
+        long_name_df = survey_df.loc[name_length_mask, ["name"]].copy()
+        long_name_df["length"] = name_lengths[name_length_mask]
+        long_name_df["excel_row"] = long_name_df.index + 2
+
+        findings.append(Finding(
+            "warning",
+            f"Question names exceeding {MAX_NAME_LENGTH} characters detected.",
+            caption="Shorter names (< = 100 characters) are recommended for better usability and readability.",
+            table=long_name_df[["excel_row", "name", "length"]],
+        ))
+
+    # -------- Meta Columns ---------- #
+    # Normalize all survey names to lowercase and strip whitespace
+    survey_names_normalized = (
+        survey_df["name"]
+        .dropna()
+        .astype(str)
+        .str.strip()
+        .str.lower()
+    )
+    # Normalize all required standard names to lowercase and strip whitespace
+    required_names_normalized = {n.strip().lower() for n in REQUIRED_STANDARD_NAMES}
+
+    # Find Missing Required Standard Names
+    missing_standard_names = sorted(required_names_normalized - set(survey_names_normalized))
+
+    if missing_standard_names:
+        # Map back to original case for display
+        display_names = sorted([
+            next(orig for orig in REQUIRED_STANDARD_NAMES if orig.lower() == m)
+            for m in missing_standard_names
+        ])
+
+        findings.append(Finding(
+            "warning",
+            "Missing standard organization fields detected.",
+            caption="These question names are expected across all ATR related forms, but were not found in this XLSForm.",
+            table=pd.DataFrame({"missing_field_name": display_names}),
+        ))
+
+    #TODO: Show which ones are present for better user experience
+
+    # ---------- Check capitalization of "names" column ---------- #
+    lowercase_mask = survey_df["name"].str.match(LOWERCASE_NAME_RE, na=True)
+
+    # Identify rows that should follow the lowercase rule
+    non_standard_mask = ~survey_df["name"].astype(str).str.lower().isin(required_names_normalized)
+
+    invalid_lowercase_mask = (~lowercase_mask) & non_standard_mask
+
+    if invalid_lowercase_mask.any():
+        invalid_case_df = survey_df.loc[invalid_lowercase_mask, ["name"]].copy()
+        invalid_case_df["excel_row"] = invalid_case_df.index + 2
+
+        findings.append(Finding(
+            "warning",
+            "Non-standard naming detected (must be lowercase).",
+            caption="All question names must be lowercase (snake_case), except for the predefined standard fields.",
+            table=invalid_case_df[["excel_row", "name"]],
+        ))
+    #TODO: [Optional] Show suggested fix for the non-standard name
+
+    # --------- Check fo Media fields followed immediately by calculate field with name <media_name> + _qa  ---------#
+    media_errors = []
+
+    for i in range(len(survey_df) - 1):
+
+        current_type = survey_df.loc[i, "type_norm"]
+        current_name = survey_df.loc[i, "name_norm"]
+
+        if current_type in MEDIA_QA_RULES:
+
+            expected_suffix = MEDIA_QA_RULES[current_type]
+            expected_name = f"{current_name}{expected_suffix}"
+
+            # Look forward (skip empty rows)
+            j = i + 1
+            while j < len(survey_df) and survey_df.loc[j, "type_norm"] == "":
+                j += 1
+
+            # No next row
+            if j >= len(survey_df):
+                media_errors.append({
+                    "excel_row": i + 2,
+                    "type": current_type,
+                    "name": current_name,
+                    "issue": "Missing calculate row after field"
+                })
+                continue
+
+            next_type = survey_df.loc[j, "type_norm"]
+            next_name = survey_df.loc[j, "name_norm"]
+
+            if not (next_type == "calculate" and next_name == expected_name):
+                media_errors.append({
+                    "field_excel_row": i + 2,
+                    "field_type": current_type,
+                    "field_name": current_name,
+                    "expected_calculate_name": expected_name,
+                    "found_type": next_type,
+                    "found_name": next_name,
+                    "found_excel_row": j + 2
+                })
+
+    if media_errors:
+        findings.append(Finding(
+            "warning",
+            "Media QA validation failed.",
+            caption=(
+                "Media fields must be followed by a calculate field:\n"
+                "- image → <name>_qa\n"
+                "- audio → <name>_translation"
+            ),
+            table=pd.DataFrame(media_errors),
+        ))